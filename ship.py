@@ -8,26 +8,64 @@ Licence: MIT 23.07.2025
 import os
 import re
 import sys
+import ast
+import time
 import json
-import yaml
+import mmap
+import uuid
+import stat
+import shlex
+import errno
+import fcntl
+import string
+import signal
 import shutil
+import fnmatch
 import hashlib
 import logging
+import operator
 import tempfile
+import functools
+import threading
+import contextlib
 import subprocess
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple, Any, Union
-from datetime import datetime, timedelta
+from datetime import datetime
 
 try:
     import tomllib
-    import tomli_w
 except ImportError:
     import tomli as tomllib
-    import tomli_w
+import tomli_w
 
-import requests
-import paramiko
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# yaml and requests are imported where they are used, most invocations need
+# neither and they noticeably slow down interpreter startup
+
+
+# Read size for hashing when the file cannot be memory-mapped. Large blocks let
+# OpenSSL's SHA-NI/AVX2 code run over many 64-byte blocks per update() call.
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Files up to this size are read ahead into memory while others are hashed
+CHECKSUM_PIPELINE_MAX_BYTES = 16 * 1024 * 1024
+
+# Config files from this size on are parsed from a memory mapping, not a read() copy
+MMAP_READ_MIN_BYTES = 256 * 1024
+
+# checksums.sha256 entries with this prefix carry one hash per fixed-size chunk
+CHUNKED_HASH_PREFIX = 'sha256-chunked:'
+
+# ioctl that shares a file's extents with another file (btrfs, XFS, bcachefs)
+FICLONE = getattr(fcntl, 'FICLONE', 0x40049409)
+
+# Errors meaning the kernel cannot clone or copy between these two files
+_NO_KERNEL_COPY_ERRORS = {errno.EOPNOTSUPP, errno.ENOTTY, errno.ENOSYS, errno.EXDEV, errno.EINVAL}
 
 
 class UpdaterError(Exception):
@@ -35,13 +73,448 @@ class UpdaterError(Exception):
     pass
 
 
+@functools.lru_cache(maxsize=None)
+def _yaml_loader() -> Any:
+    """Resolve the YAML loader class once, a failed import is not cached by Python"""
+    # Prefer the libyaml based loader, it is an order of magnitude faster
+    try:
+        from yaml import CSafeLoader as Loader
+    except ImportError:
+        from yaml import SafeLoader as Loader
+    return Loader
+
+
+def load_yaml(path: Path) -> Any:
+    """Load a YAML document using the fastest available safe loader"""
+    import yaml
+    
+    # Bytes let libyaml detect the encoding itself instead of a Python decode pass
+    with open(path, 'rb') as f:
+        return yaml.load(f, Loader=_yaml_loader())
+
+
+def json_loads(data: Union[bytes, memoryview]) -> Any:
+    """Parse JSON with orjson when installed, falling back to the json module"""
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # NaN, Infinity and integers beyond 64 bit are only accepted by json
+            pass
+    # json only takes bytes, not memoryviews of a mapping
+    return json.loads(data if isinstance(data, bytes) else bytes(data))
+
+
+def json_dumps(obj: Any) -> bytes:
+    """Serialize JSON indented by two spaces, with orjson when installed"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+        except orjson.JSONEncodeError:
+            pass
+    return json.dumps(obj, indent=2).encode()
+
+
+@contextlib.contextmanager
+def read_buffer(path: Path):
+    """Contents of a file as bytes, or as a view of a read-only mapping for large files"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < MMAP_READ_MIN_BYTES:
+            yield f.read()
+            return
+        
+        # Parsers read straight from the page cache, pages fault in ahead of them
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mm, 'madvise'):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            with memoryview(mm) as view:
+                yield view
+
+
+def load_toml(path: Path) -> Dict:
+    """Load a TOML file, decoding it without an intermediate bytes copy"""
+    with read_buffer(path) as data:
+        return tomllib.loads(str(data, 'utf-8'))
+
+
+def load_json(path: Path) -> Any:
+    """Load a JSON file, orjson parses a mapped file in place"""
+    with read_buffer(path) as data:
+        return json_loads(data)
+
+
+@functools.lru_cache(maxsize=None)
+def parse_version(version: str) -> Tuple[int, ...]:
+    """Parse 'v1.2.3' style version strings into int tuples, once per distinct string"""
+    return tuple(map(int, version.lstrip('v').split('.')))
+
+
+# AST nodes allowed in rollout criteria such as "server_id < 10 or server_id % 5 == 0"
+_CRITERIA_NODES = (
+    ast.Expression, ast.Compare, ast.BoolOp, ast.UnaryOp, ast.BinOp, ast.Name,
+    ast.Constant, ast.Tuple, ast.List, ast.Set, ast.Load,
+    ast.cmpop, ast.boolop, ast.unaryop,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod,
+)
+
+
+@functools.lru_cache(maxsize=256)
+def compile_criteria(expression: str) -> Any:
+    """Compile a rollout criteria expression after checking it only does arithmetic on server_id"""
+    tree = ast.parse(expression, mode='eval')
+    for node in ast.walk(tree):
+        if not isinstance(node, _CRITERIA_NODES):
+            raise ValueError(f"Unsupported element in criteria: {type(node).__name__}")
+        if isinstance(node, ast.Name) and node.id != 'server_id':
+            raise ValueError(f"Unknown name in criteria: {node.id}")
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+            raise ValueError(f"Unsupported constant in criteria: {node.value!r}")
+    return compile(tree, '<criteria>', 'eval')
+
+
+@functools.lru_cache(maxsize=256)
+def compile_template(template: str) -> Optional[Tuple[Tuple[str, Optional[str]], ...]]:
+    """Split a str.format template into (literal, field name) pairs once per template
+    
+    Returns None for templates with conversions, format specs or attribute and
+    index lookups, those are rendered by str.format itself.
+    """
+    segments = []
+    for literal, field, spec, conversion in string.Formatter().parse(template):
+        if field is not None and (spec or conversion or not field.isidentifier()):
+            return None
+        segments.append((literal, field))
+    return tuple(segments)
+
+
+def render_template(template: str, context: Dict) -> str:
+    """Same result as template.format(**context) without parsing the template again"""
+    segments = compile_template(template)
+    if segments is None:
+        return template.format(**context)
+    return ''.join([
+        literal if field is None else literal + format(context[field])
+        for literal, field in segments
+    ])
+
+
+@functools.lru_cache(maxsize=None)
+def get_current_version(app_dir: str) -> str:
+    """Get current application version, cached for the duration of a run"""
+    try:
+        # Try git describe
+        result = subprocess.run([
+            'git', '-C', app_dir, 'describe', '--tags', '--abbrev=0'
+        ], capture_output=True, text=True)
+        
+        if result.returncode == 0:
+            return result.stdout.strip()
+        
+        # Fallback to version file
+        version_file = Path(app_dir) / 'VERSION'
+        if version_file.exists():
+            return version_file.read_text().strip()
+        
+        return '0.0.0'
+        
+    except Exception:
+        return '0.0.0'
+
+
+def _kernel_copy(src_fd: int, dst_fd: int) -> bool:
+    """Copy file contents without passing them through user space, False if unsupported"""
+    # Reflink first, it only shares extents and is instant regardless of size
+    try:
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+        return True
+    except OSError as e:
+        if e.errno not in _NO_KERNEL_COPY_ERRORS:
+            raise
+    
+    if not hasattr(os, 'copy_file_range'):
+        return False
+    
+    remaining = os.fstat(src_fd).st_size
+    try:
+        while remaining > 0:
+            copied = os.copy_file_range(src_fd, dst_fd, remaining)
+            if not copied:
+                break
+            remaining -= copied
+    except OSError as e:
+        if e.errno not in _NO_KERNEL_COPY_ERRORS:
+            raise
+        return False
+    # Some filesystems report 0 instead of an error, the caller then copies in user space
+    return remaining <= 0
+
+
+def fast_copy(src: Union[str, Path], dst: Union[str, Path]) -> Union[str, Path]:
+    """Copy a file with its metadata, in kernel where possible, else via shutil.copy2"""
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        copied = _kernel_copy(fsrc.fileno(), fdst.fileno())
+    if not copied:
+        return shutil.copy2(src, dst)
+    shutil.copystat(src, dst)
+    return dst
+
+
+def _copy_entry(src: str, dst: str, src_stat: os.stat_result, privileged: bool):
+    """Copy one regular file for mirror_tree, with its owner when running as root"""
+    fast_copy(src, dst)
+    if privileged:
+        os.chown(dst, src_stat.st_uid, src_stat.st_gid)
+        # chown drops setuid/setgid bits, restore the full mode
+        os.chmod(dst, stat.S_IMODE(src_stat.st_mode))
+
+
+def mirror_tree(source: Path, target: Path):
+    """Make target an exact copy of source, like ``rsync -a --delete``
+    
+    Files whose size and mtime already match are left alone, the remaining
+    copies run on a thread pool and are reflinked on copy-on-write filesystems.
+    Owners and device nodes are only preserved when running as root, as with rsync.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    
+    privileged = os.geteuid() == 0
+    directories = []
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+        copies = []
+        pending = [(str(source), str(target))]
+        os.makedirs(target, exist_ok=True)
+        
+        while pending:
+            src_dir, dst_dir = pending.pop()
+            directories.append((src_dir, dst_dir))
+            
+            with os.scandir(src_dir) as entries:
+                src_entries = {entry.name: entry for entry in entries}
+            
+            # Drop whatever is gone from source or changed between file and directory
+            with os.scandir(dst_dir) as entries:
+                for entry in entries:
+                    src_entry = src_entries.get(entry.name)
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    if src_entry is None or src_entry.is_dir(follow_symlinks=False) != is_dir:
+                        if is_dir:
+                            shutil.rmtree(entry.path)
+                        else:
+                            os.unlink(entry.path)
+            
+            for name, entry in src_entries.items():
+                dst_path = os.path.join(dst_dir, name)
+                
+                if entry.is_dir(follow_symlinks=False):
+                    os.makedirs(dst_path, exist_ok=True)
+                    pending.append((entry.path, dst_path))
+                    continue
+                
+                try:
+                    dst_stat = os.lstat(dst_path)
+                except FileNotFoundError:
+                    dst_stat = None
+                
+                src_stat = entry.stat(follow_symlinks=False)
+                
+                if entry.is_symlink():
+                    if dst_stat is not None:
+                        os.unlink(dst_path)
+                    os.symlink(os.readlink(entry.path), dst_path)
+                    if privileged:
+                        os.chown(dst_path, src_stat.st_uid, src_stat.st_gid, follow_symlinks=False)
+                    os.utime(dst_path, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns), follow_symlinks=False)
+                    continue
+                
+                # Fifos and sockets are recreated, device nodes only as root (rsync -D)
+                if not entry.is_file(follow_symlinks=False):
+                    is_device = stat.S_ISCHR(src_stat.st_mode) or stat.S_ISBLK(src_stat.st_mode)
+                    if is_device and not privileged:
+                        continue
+                    if dst_stat is not None:
+                        os.unlink(dst_path)
+                    os.mknod(dst_path, src_stat.st_mode, src_stat.st_rdev if is_device else 0)
+                    if privileged:
+                        os.chown(dst_path, src_stat.st_uid, src_stat.st_gid)
+                    os.chmod(dst_path, stat.S_IMODE(src_stat.st_mode))
+                    os.utime(dst_path, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
+                    continue
+                
+                if dst_stat is not None:
+                    if (stat.S_ISREG(dst_stat.st_mode) and dst_stat.st_size == src_stat.st_size
+                            and dst_stat.st_mtime_ns == src_stat.st_mtime_ns):
+                        # Unchanged content, still bring owner and mode in line like rsync
+                        if privileged and (dst_stat.st_uid, dst_stat.st_gid) != (src_stat.st_uid, src_stat.st_gid):
+                            os.chown(dst_path, src_stat.st_uid, src_stat.st_gid)
+                            dst_stat = None
+                        if dst_stat is None or dst_stat.st_mode != src_stat.st_mode:
+                            os.chmod(dst_path, stat.S_IMODE(src_stat.st_mode))
+                        continue
+                    # Replace rather than rewrite in place, hard links keep the old data
+                    os.unlink(dst_path)
+                
+                copies.append(executor.submit(_copy_entry, entry.path, dst_path, src_stat, privileged))
+        
+        for future in copies:
+            future.result()
+    
+    # Directory owners and times last, creating entries above has changed the times
+    for src_dir, dst_dir in directories:
+        if privileged:
+            dir_stat = os.lstat(src_dir)
+            os.chown(dst_dir, dir_stat.st_uid, dir_stat.st_gid)
+        shutil.copystat(src_dir, dst_dir)
+
+
+# Characters that make /bin/sh do more than split words and strip quotes, braces
+# included as bash expands them even when it runs as sh
+_SHELL_SPECIAL = re.compile(r'[|&;<>()$`*?\[\]{}~#\\\n]')
+
+# Leading words that are shell syntax or builtins rather than programs
+_SHELL_BUILTINS = frozenset({
+    '!', 'if', 'for', 'while', 'until', 'case', '.', 'source', 'cd', 'eval',
+    'exec', 'exit', 'export', 'local', 'read', 'readonly', 'return', 'set', 'shift',
+    'trap', 'ulimit', 'umask', 'unset', 'wait',
+})
+
+
+def split_command(command: str) -> Optional[List[str]]:
+    """Split a command into argv when /bin/sh would just run it as a program, else None"""
+    if _SHELL_SPECIAL.search(command):
+        return None
+    try:
+        argv = shlex.split(command)
+    except ValueError:
+        return None
+    # A leading NAME=value is a variable assignment for the command
+    if not argv or argv[0] in _SHELL_BUILTINS or '=' in argv[0]:
+        return None
+    return argv
+
+
+class ShellSession:
+    """Runs shell commands through one long-lived /bin/sh process
+    
+    Each command still gets its own subshell, so directory changes, variables
+    and exit calls do not leak into the next command, but the expensive
+    fork/exec of a fresh shell from the Python process happens only once.
+    """
+    
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._process = None
+        self._marker = b''
+        self._buffer = b''
+        self._output_dir = None
+    
+    def __enter__(self) -> 'ShellSession':
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def run(self, command: str, cwd: Optional[Path] = None,
+            timeout: Optional[float] = None) -> subprocess.CompletedProcess:
+        """Run a shell command, mirroring subprocess.run(shell=True, capture_output=True)"""
+        if not isinstance(command, str):
+            raise TypeError(f"Shell command must be a string, not {type(command).__name__}")
+        
+        if self._process is None or self._process.poll() is not None:
+            self._start()
+        
+        stdout_path = os.path.join(self._output_dir, 'stdout')
+        stderr_path = os.path.join(self._output_dir, 'stderr')
+        directory = shlex.quote(str(cwd)) if cwd is not None else '.'
+        script = (
+            f"( cd {directory} && eval {shlex.quote(command)} ) "
+            f"</dev/null >{shlex.quote(stdout_path)} 2>{shlex.quote(stderr_path)}; "
+            f"printf '%s %d\\n' {self._marker.decode()} \"$?\"\n"
+        )
+        self._process.stdin.write(script.encode())
+        self._process.stdin.flush()
+        
+        returncode = self._wait_for_marker(command, timeout)
+        
+        with open(stdout_path, errors='replace') as f:
+            stdout = f.read()
+        with open(stderr_path, errors='replace') as f:
+            stderr = f.read()
+        
+        return subprocess.CompletedProcess(command, returncode, stdout, stderr)
+    
+    def close(self):
+        """Terminate the shell and remove its output files"""
+        if self._process is not None:
+            try:
+                self._process.stdin.close()
+                self._process.wait(timeout=5)
+            except Exception:
+                self._kill()
+            self._process = None
+        
+        if self._output_dir is not None:
+            shutil.rmtree(self._output_dir, ignore_errors=True)
+            self._output_dir = None
+    
+    def _start(self):
+        """Start a fresh shell process"""
+        if self._output_dir is None:
+            self._output_dir = tempfile.mkdtemp(prefix='ship_shell_')
+        self._marker = f"__SHIP_DONE_{uuid.uuid4().hex}__".encode()
+        self._buffer = b''
+        self._process = subprocess.Popen(
+            ['/bin/sh'], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL, start_new_session=True
+        )
+    
+    def _wait_for_marker(self, command: str, timeout: Optional[float]) -> int:
+        """Read shell output until the completion marker, return the exit code"""
+        import selectors
+        
+        deadline = None if timeout is None else time.monotonic() + timeout
+        fd = self._process.stdout.fileno()
+        
+        with selectors.DefaultSelector() as selector:
+            selector.register(fd, selectors.EVENT_READ)
+            
+            while self._marker not in self._buffer:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0 or not selector.select(remaining):
+                    self._kill()
+                    raise subprocess.TimeoutExpired(command, timeout)
+                
+                data = os.read(fd, 4096)
+                if not data:
+                    self._kill()
+                    raise UpdaterError(f"Shell exited while running: {command}")
+                self._buffer += data
+        
+        _, _, rest = self._buffer.partition(self._marker)
+        status, _, self._buffer = rest.lstrip().partition(b'\n')
+        return int(status)
+    
+    def _kill(self):
+        """Kill the shell and any command still running in it"""
+        try:
+            os.killpg(self._process.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        self._process.wait()
+        self._process = None
+
+
 class RequirementsChecker:
     """Checks system requirements and environment before update"""
     
+    # From this many required commands on, one listing of PATH beats shutil.which
+    _PATH_SCAN_THRESHOLD = 30
+    
     def __init__(self):
         self.logger = logging.getLogger(__name__)
+        self._disk_space_cache = {}
     
-    def check_requirements(self, requirements: Dict) -> Tuple[bool, List[str]]:
+    def check_requirements(self, requirements: Dict,
+                           target_path: Optional[Path] = None) -> Tuple[bool, List[str]]:
         """Check all requirements, return (success, errors)"""
         errors = []
         
@@ -52,7 +525,7 @@ class RequirementsChecker:
         
         # Check disk space
         if 'min_disk_space_mb' in requirements:
-            if not self._check_disk_space(requirements['min_disk_space_mb']):
+            if not self._check_disk_space(requirements['min_disk_space_mb'], target_path):
                 errors.append(f"Need {requirements['min_disk_space_mb']}MB free space")
         
         # Check required commands
@@ -77,59 +550,95 @@ class RequirementsChecker:
     
     def _check_python_version(self, min_version: str) -> bool:
         """Check if Python version meets minimum requirement"""
-        current = tuple(map(int, f"{sys.version_info.major}.{sys.version_info.minor}".split('.')))
-        required = tuple(map(int, min_version.split('.')))
+        current = sys.version_info[:2]
+        required = parse_version(str(min_version))
         return current >= required
     
-    def _check_disk_space(self, min_mb: int) -> bool:
-        """Check available disk space"""
+    def _check_disk_space(self, min_mb: int, target_path: Optional[Path] = None) -> bool:
+        """Check available disk space on the filesystem holding target_path"""
         try:
-            stat = shutil.disk_usage('/')
-            available_mb = stat.free / (1024 * 1024)
-            return available_mb >= min_mb
+            # The target may not exist yet, check the filesystem it will live on
+            path = Path(target_path or '/').absolute()
+            while not path.exists() and path != path.parent:
+                path = path.parent
+            
+            key = str(path)
+            if key not in self._disk_space_cache:
+                stat = os.statvfs(key)
+                self._disk_space_cache[key] = stat.f_bavail * stat.f_frsize / (1024 * 1024)
+            
+            return self._disk_space_cache[key] >= min_mb
         except Exception:
             return False
     
     def _check_commands(self, commands: List[str]) -> List[str]:
         """Check if required commands are available"""
+        # A handful of commands is cheaper with shutil.which than listing PATH
+        if len(commands) < self._PATH_SCAN_THRESHOLD:
+            return [cmd for cmd in commands if not shutil.which(cmd)]
+        
+        # List every PATH directory once instead of one lookup walk per command
+        executables = {}
+        for directory in os.environ.get('PATH', os.defpath).split(os.pathsep):
+            try:
+                with os.scandir(directory or '.') as entries:
+                    for entry in entries:
+                        executables.setdefault(entry.name, entry.path)
+            except OSError:
+                continue
+        
         missing = []
         for cmd in commands:
+            path = executables.get(cmd)
+            if path and os.access(path, os.X_OK) and not os.path.isdir(path):
+                continue
+            # Absolute paths and shadowed entries take the slow path
             if not shutil.which(cmd):
                 missing.append(cmd)
         return missing
     
     def _check_services(self, services: List[str]) -> List[str]:
         """Check if required services are running"""
-        failed = []
-        for service in services:
-            try:
-                result = subprocess.run([
-                    'systemctl', 'is-active', service
-                ], capture_output=True, text=True)
-                if result.returncode != 0:
-                    failed.append(service)
-            except Exception:
-                failed.append(service)
-        return failed
+        if not services:
+            return []
+        
+        try:
+            # systemctl prints one state per unit, in argument order
+            result = subprocess.run([
+                'systemctl', 'is-active', *services
+            ], capture_output=True, text=True)
+            states = result.stdout.splitlines()
+        except Exception:
+            return list(services)
+        
+        return [
+            service for index, service in enumerate(services)
+            if index >= len(states) or states[index].strip() != 'active'
+        ]
     
     def _check_environment(self, env_checks: List[Dict]) -> List[str]:
         """Run custom environment checks"""
         failed = []
-        for check in env_checks:
-            name = check.get('name', 'unnamed_check')
-            command = check.get('command')
-            
-            try:
-                result = subprocess.run(
-                    command, shell=True, capture_output=True, 
-                    text=True, timeout=30
-                )
-                if result.returncode != 0:
+        with ShellSession() as shell:
+            for check in env_checks:
+                name = check.get('name', 'unnamed_check')
+                command = check.get('command')
+                argv = check.get('argv')
+                
+                try:
+                    # An argv list is executed directly, without a shell
+                    if isinstance(argv, list):
+                        result = subprocess.run(
+                            argv, capture_output=True, text=True, timeout=30
+                        )
+                    else:
+                        result = shell.run(command, timeout=30)
+                    if result.returncode != 0:
+                        failed.append(name)
+                        self.logger.warning(f"Environment check failed: {name} - {result.stderr}")
+                except Exception as e:
                     failed.append(name)
-                    self.logger.warning(f"Environment check failed: {name} - {result.stderr}")
-            except Exception as e:
-                failed.append(name)
-                self.logger.warning(f"Environment check error: {name} - {e}")
+                    self.logger.warning(f"Environment check error: {name} - {e}")
         
         return failed
 
@@ -137,6 +646,9 @@ class RequirementsChecker:
 class SecurityValidator:
     """Validates file security and integrity"""
     
+    # "<hash>  <relative path>" lines of a sha256sum style manifest, comments skipped
+    _CHECKSUM_LINE = re.compile(rb'^[ \t]*([^#\s][^\r\n]*?)  ([^\r\n]*?\S)\s*$', re.MULTILINE)
+    
     def __init__(self):
         self.logger = logging.getLogger(__name__)
     
@@ -166,23 +678,17 @@ class SecurityValidator:
             return True
         
         try:
-            with open(checksum_file) as f:
-                for line in f:
-                    line = line.strip()
-                    if not line or line.startswith('#'):
-                        continue
-                    
-                    parts = line.split('  ', 1)
-                    if len(parts) != 2:
-                        continue
-                    
-                    expected_hash, rel_path = parts
-                    file_path = source_dir / rel_path
-                    
-                    if file_path.exists():
-                        if not self.verify_checksum(file_path, expected_hash):
-                            self.logger.error(f"Checksum mismatch: {rel_path}")
-                            return False
+            import asyncio
+            
+            # Parse the whole manifest in one regex pass instead of line by line
+            entries = []
+            for match in self._CHECKSUM_LINE.finditer(checksum_file.read_bytes()):
+                expected_hash = match.group(1).decode()
+                rel_path = match.group(2).decode()
+                entries.append((source_dir / rel_path, expected_hash, rel_path))
+            
+            if not asyncio.run(self._verify_entries(entries)):
+                return False
             
             self.logger.info("All checksums verified successfully")
             return True
@@ -191,15 +697,121 @@ class SecurityValidator:
             self.logger.error(f"Checksum verification failed: {e}")
             return False
     
+    async def _verify_entries(self, entries: List[Tuple[Path, str, str]]) -> bool:
+        """Verify (file_path, expected_hash, rel_path) entries, overlapping reads and hashing
+        
+        A producer reads files into a bounded queue while hasher tasks drain it,
+        so disk reads for the next files run while the current ones are hashed.
+        """
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+        
+        loop = asyncio.get_running_loop()
+        hashers = os.cpu_count() or 1
+        queue = asyncio.Queue(maxsize=8)
+        
+        with ThreadPoolExecutor(max_workers=hashers + 1) as executor:
+            async def produce():
+                for file_path, expected_hash, rel_path in entries:
+                    try:
+                        size = file_path.stat().st_size
+                        # Large and chunk-verified files are read by the hasher itself
+                        if expected_hash.startswith(CHUNKED_HASH_PREFIX) or size > CHECKSUM_PIPELINE_MAX_BYTES:
+                            data = None
+                        else:
+                            data = await loop.run_in_executor(executor, file_path.read_bytes)
+                    except (FileNotFoundError, NotADirectoryError):
+                        # Listed files missing from the update are skipped
+                        continue
+                    except OSError as e:
+                        data = e
+                    await queue.put((file_path, expected_hash, rel_path, data))
+                
+                for _ in range(hashers):
+                    await queue.put(None)
+            
+            async def consume():
+                while True:
+                    item = await queue.get()
+                    if item is None:
+                        return True
+                    
+                    file_path, expected_hash, rel_path, data = item
+                    if isinstance(data, Exception):
+                        self.logger.error(f"Checksum calculation failed: {data}")
+                        matched = False
+                    elif data is None:
+                        matched = await loop.run_in_executor(
+                            executor, self.verify_checksum, file_path, expected_hash
+                        )
+                    else:
+                        # hashlib releases the GIL, hashers run truly in parallel
+                        actual_hash = await loop.run_in_executor(
+                            executor, lambda: hashlib.sha256(data).hexdigest()
+                        )
+                        matched = actual_hash == expected_hash
+                    
+                    if not matched:
+                        self.logger.error(f"Checksum mismatch: {rel_path}")
+                        return False
+            
+            producer = asyncio.ensure_future(produce())
+            consumers = [asyncio.ensure_future(consume()) for _ in range(hashers)]
+            
+            try:
+                for next_done in asyncio.as_completed(consumers):
+                    if not await next_done:
+                        return False
+                await producer
+                return True
+            finally:
+                producer.cancel()
+                for consumer in consumers:
+                    consumer.cancel()
+                await asyncio.gather(producer, *consumers, return_exceptions=True)
+    
     def verify_checksum(self, file_path: Path, expected_hash: str, algorithm: str = 'sha256') -> bool:
         """Verify single file checksum"""
         try:
+            # sha256-chunked:<chunk_size>:<hash0>,<hash1>,...
+            if expected_hash.startswith(CHUNKED_HASH_PREFIX):
+                chunk_size, _, hashes = expected_hash[len(CHUNKED_HASH_PREFIX):].partition(':')
+                return self._verify_chunked(file_path, int(chunk_size), hashes.split(','))
+            
             actual_hash = self._calculate_hash(file_path, algorithm)
             return actual_hash == expected_hash
         except Exception as e:
             self.logger.error(f"Checksum calculation failed: {e}")
             return False
     
+    def _verify_chunked(self, file_path: Path, chunk_size: int, hashes: List[str]) -> bool:
+        """Verify fixed-size chunks of a file in parallel, stopping at the first mismatch"""
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+        
+        if chunk_size <= 0:
+            raise ValueError(f"Invalid chunk size: {chunk_size}")
+        
+        fd = os.open(file_path, os.O_RDONLY)
+        try:
+            size = os.fstat(fd).st_size
+            if len(hashes) != max(1, -(-size // chunk_size)):
+                return False
+            
+            def chunk_matches(index: int) -> bool:
+                data = os.pread(fd, chunk_size, index * chunk_size)
+                return hashlib.sha256(data).hexdigest() == hashes[index]
+            
+            with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+                futures = [executor.submit(chunk_matches, i) for i in range(len(hashes))]
+                for future in as_completed(futures):
+                    if not future.result():
+                        for pending in futures:
+                            pending.cancel()
+                        return False
+            return True
+        finally:
+            os.close(fd)
+    
     def _check_file_type(self, file_path: Path, allowed_types: List[str]) -> bool:
         """Check if file type is allowed"""
         return file_path.suffix.lower() in [t.lower() for t in allowed_types]
@@ -214,19 +826,57 @@ class SecurityValidator:
     
     def _calculate_hash(self, file_path: Path, algorithm: str = 'sha256') -> str:
         """Calculate file hash"""
-        hash_obj = hashlib.new(algorithm)
-        with open(file_path, 'rb') as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_obj.update(chunk)
+        # Unbuffered, every read path below brings its own buffer
+        with open(file_path, 'rb', buffering=0) as f:
+            # Python 3.11+: let hashlib drive the read loop in C
+            if hasattr(hashlib, 'file_digest'):
+                return hashlib.file_digest(f, algorithm).hexdigest()
+            
+            hash_obj = hashlib.new(algorithm)
+            if os.fstat(f.fileno()).st_size == 0:
+                # mmap refuses zero-length files
+                return hash_obj.hexdigest()
+            
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    hash_obj.update(mm)
+            except (OSError, ValueError):
+                # Reuse one buffer instead of allocating a bytes object per block
+                buffer = bytearray(HASH_CHUNK_SIZE)
+                view = memoryview(buffer)
+                while True:
+                    size = f.readinto(buffer)
+                    if not size:
+                        break
+                    hash_obj.update(view[:size])
         return hash_obj.hexdigest()
 
 
 class ConditionalProcessor:
     """Processes conditional rules from manifest"""
     
+    # Version comparison operators, two-character operators are matched first
+    _VERSION_OPERATORS = (
+        ('<=', operator.le),
+        ('>=', operator.ge),
+        ('==', operator.eq),
+        ('!=', operator.ne),
+        ('<', operator.lt),
+        ('>', operator.gt),
+    )
+    
+    # Condition function prefix -> handler method, dispatched with one dict lookup
+    _CONDITION_HANDLERS = {
+        'file_exists(': '_evaluate_file_condition',
+        'service_running(': '_evaluate_service_condition',
+        'env_var(': '_evaluate_env_condition',
+        'command(': '_evaluate_command_condition',
+    }
+    
     def __init__(self, app_dir: Path):
         self.app_dir = app_dir
         self.logger = logging.getLogger(__name__)
+        self._service_cache = {}
     
     def evaluate_conditionals(self, conditionals: List[Dict]) -> Tuple[bool, str, List[str]]:
         """
@@ -253,30 +903,17 @@ class ConditionalProcessor:
     def _evaluate_condition(self, condition: str) -> bool:
         """Evaluate a single condition"""
         try:
-            # File existence checks
-            if condition.startswith('file_exists('):
-                file_path = self._extract_string_from_function(condition, 'file_exists')
-                return Path(file_path).exists()
+            paren = condition.find('(')
+            handler = self._CONDITION_HANDLERS.get(condition[:paren + 1]) if paren > 0 else None
             
-            # Service running checks
-            elif condition.startswith('service_running('):
-                service = self._extract_string_from_function(condition, 'service_running')
-                return self._is_service_running(service)
+            # Function style checks: file_exists, service_running, env_var, command
+            if handler:
+                return getattr(self, handler)(condition)
             
             # Version comparison
             elif 'current_version' in condition:
                 return self._evaluate_version_condition(condition)
             
-            # Environment variable checks
-            elif condition.startswith('env_var('):
-                return self._evaluate_env_condition(condition)
-            
-            # Custom command evaluation
-            elif condition.startswith('command('):
-                command = self._extract_string_from_function(condition, 'command')
-                result = subprocess.run(command, shell=True, capture_output=True)
-                return result.returncode == 0
-            
             else:
                 self.logger.warning(f"Unknown condition: {condition}")
                 return False
@@ -285,21 +922,56 @@ class ConditionalProcessor:
             self.logger.error(f"Condition evaluation failed: {condition} - {e}")
             return False
     
+    def _evaluate_file_condition(self, condition: str) -> bool:
+        """Evaluate file_exists('path')"""
+        file_path = self._extract_string_from_function(condition, 'file_exists')
+        return Path(file_path).exists()
+    
+    def _evaluate_service_condition(self, condition: str) -> bool:
+        """Evaluate service_running('name')"""
+        service = self._extract_string_from_function(condition, 'service_running')
+        return self._is_service_running(service)
+    
+    def _evaluate_command_condition(self, condition: str) -> bool:
+        """Evaluate command('shell command')"""
+        command = self._extract_string_from_function(condition, 'command')
+        result = subprocess.run(command, shell=True, capture_output=True)
+        return result.returncode == 0
+    
     def _extract_string_from_function(self, condition: str, func_name: str) -> str:
         """Extract string parameter from function call"""
-        pattern = rf"{func_name}\(['\"]([^'\"]+)['\"]"
-        match = re.search(pattern, condition)
-        return match.group(1) if match else ""
+        start = condition.find(func_name + '(')
+        if start == -1:
+            return ""
+        return self._extract_quoted(condition, start + len(func_name) + 1)[0]
+    
+    @staticmethod
+    def _extract_quoted(text: str, start: int) -> Tuple[str, int]:
+        """Return the quoted string at text[start] and the index after it"""
+        quote = text[start:start + 1]
+        if quote not in ("'", '"'):
+            return "", -1
+        
+        end = text.find(quote, start + 1)
+        if end == -1:
+            return "", -1
+        return text[start + 1:end], end + 1
     
     def _is_service_running(self, service: str) -> bool:
         """Check if systemd service is running"""
+        if service in self._service_cache:
+            return self._service_cache[service]
+        
         try:
             result = subprocess.run([
                 'systemctl', 'is-active', service
             ], capture_output=True, text=True)
-            return result.returncode == 0
+            running = result.returncode == 0
         except Exception:
-            return False
+            running = False
+        
+        self._service_cache[service] = running
+        return running
     
     def _evaluate_version_condition(self, condition: str) -> bool:
         """Evaluate version comparison conditions"""
@@ -308,15 +980,10 @@ class ConditionalProcessor:
             current_version = self._get_current_version()
             
             # Parse condition like "current_version < '1.0.0'"
-            if '<' in condition:
-                target_version = condition.split('<')[1].strip().strip("'\"")
-                return self._compare_versions(current_version, target_version) < 0
-            elif '>' in condition:
-                target_version = condition.split('>')[1].strip().strip("'\"")
-                return self._compare_versions(current_version, target_version) > 0
-            elif '==' in condition:
-                target_version = condition.split('==')[1].strip().strip("'\"")
-                return self._compare_versions(current_version, target_version) == 0
+            for symbol, compare in self._VERSION_OPERATORS:
+                if symbol in condition:
+                    target_version = condition.split(symbol, 1)[1].strip().strip("'\"")
+                    return compare(parse_version(current_version), parse_version(target_version))
             
             return False
             
@@ -329,15 +996,25 @@ class ConditionalProcessor:
         try:
             # Extract env var name and expected value
             # Format: env_var('VAR_NAME') == 'expected_value'
-            pattern = r"env_var\(['\"]([^'\"]+)['\"]\)\s*==\s*['\"]([^'\"]+)['\"]"
-            match = re.search(pattern, condition)
+            start = condition.find('env_var(')
+            if start == -1:
+                return False
+            
+            var_name, pos = self._extract_quoted(condition, start + len('env_var('))
+            if not var_name or condition[pos:pos + 1] != ')':
+                return False
             
-            if match:
-                var_name, expected_value = match.groups()
-                actual_value = os.environ.get(var_name, '')
-                return actual_value == expected_value
+            rest = condition[pos + 1:].lstrip()
+            if not rest.startswith('=='):
+                return False
             
-            return False
+            rest = rest[2:].lstrip()
+            expected_value, _ = self._extract_quoted(rest, 0)
+            if not expected_value:
+                return False
+            
+            actual_value = os.environ.get(var_name, '')
+            return actual_value == expected_value
             
         except Exception as e:
             self.logger.error(f"Environment condition evaluation failed: {e}")
@@ -345,31 +1022,11 @@ class ConditionalProcessor:
     
     def _get_current_version(self) -> str:
         """Get current application version"""
-        try:
-            # Try git describe
-            result = subprocess.run([
-                'git', '-C', str(self.app_dir), 'describe', '--tags', '--abbrev=0'
-            ], capture_output=True, text=True)
-            
-            if result.returncode == 0:
-                return result.stdout.strip()
-            
-            # Fallback to version file
-            version_file = self.app_dir / 'VERSION'
-            if version_file.exists():
-                return version_file.read_text().strip()
-            
-            return '0.0.0'
-            
-        except Exception:
-            return '0.0.0'
+        return get_current_version(str(self.app_dir))
     
     def _compare_versions(self, v1: str, v2: str) -> int:
         """Compare two version strings, return -1, 0, or 1"""
-        def version_tuple(v):
-            return tuple(map(int, v.lstrip('v').split('.')))
-        
-        t1, t2 = version_tuple(v1), version_tuple(v2)
+        t1, t2 = parse_version(v1), parse_version(v2)
         return (t1 > t2) - (t1 < t2)
 
 
@@ -385,15 +1042,25 @@ class MigrationRunner:
         try:
             current_version = self._get_current_version()
             
-            # Get sorted list of migration versions
+            try:
+                current_tuple = self._version_to_tuple(current_version)
+                target_tuple = self._version_to_tuple(target_version)
+            except ValueError:
+                self.logger.warning(f"Cannot compare versions {current_version} and {target_version}, "
+                                    f"skipping migrations")
+                return True
+            
+            # Parse every migration version once, then sort on the parsed tuples
             migration_versions = sorted(
-                migrations.keys(),
-                key=lambda v: tuple(map(int, v.split('.')))
+                (self._version_to_tuple(version), version) for version in migrations
             )
             
+            # Snapshot the environment once for all migration scripts
+            base_env = {**os.environ, 'APP_DIR': str(self.app_dir)}
+            
             # Run migrations for versions between current and target
-            for version in migration_versions:
-                if self._should_run_migration(current_version, version, target_version):
+            for migration_tuple, version in migration_versions:
+                if current_tuple < migration_tuple <= target_tuple:
                     self.logger.info(f"Running migration for version {version}")
                     
                     scripts = migrations[version]
@@ -401,7 +1068,7 @@ class MigrationRunner:
                         scripts = [scripts]
                     
                     for script in scripts:
-                        if not self._run_migration_script(script, version):
+                        if not self._run_migration_script(script, version, base_env):
                             return False
             
             return True
@@ -410,31 +1077,21 @@ class MigrationRunner:
             self.logger.error(f"Migration failed: {e}")
             return False
     
-    def _should_run_migration(self, current: str, migration: str, target: str) -> bool:
-        """Check if migration should be run"""
-        try:
-            current_tuple = self._version_to_tuple(current)
-            migration_tuple = self._version_to_tuple(migration)
-            target_tuple = self._version_to_tuple(target)
-            
-            return current_tuple < migration_tuple <= target_tuple
-            
-        except Exception:
-            return False
-    
-    def _run_migration_script(self, script: str, version: str) -> bool:
+    def _run_migration_script(self, script: Union[str, List[str]], version: str,
+                              base_env: Optional[Dict[str, str]] = None) -> bool:
         """Run a single migration script"""
         try:
             self.logger.info(f"Executing migration script: {script}")
             
             # Set environment variables for the script
-            env = os.environ.copy()
-            env['MIGRATION_VERSION'] = version
-            env['APP_DIR'] = str(self.app_dir)
+            if base_env is None:
+                base_env = {**os.environ, 'APP_DIR': str(self.app_dir)}
+            env = {**base_env, 'MIGRATION_VERSION': version}
             
+            # A list is an argv vector and runs without an intermediate shell
             result = subprocess.run(
                 script,
-                shell=True,
+                shell=not isinstance(script, list),
                 cwd=self.app_dir,
                 env=env,
                 timeout=600,  # 10 minute timeout
@@ -458,26 +1115,11 @@ class MigrationRunner:
     
     def _get_current_version(self) -> str:
         """Get current application version"""
-        try:
-            result = subprocess.run([
-                'git', '-C', str(self.app_dir), 'describe', '--tags', '--abbrev=0'
-            ], capture_output=True, text=True)
-            
-            if result.returncode == 0:
-                return result.stdout.strip()
-            
-            version_file = self.app_dir / 'VERSION'
-            if version_file.exists():
-                return version_file.read_text().strip()
-            
-            return '0.0.0'
-            
-        except Exception:
-            return '0.0.0'
+        return get_current_version(str(self.app_dir))
     
     def _version_to_tuple(self, version: str) -> Tuple[int, ...]:
         """Convert version string to tuple for comparison"""
-        return tuple(map(int, version.lstrip('v').split('.')))
+        return parse_version(version)
 
 
 class CleanupManager:
@@ -492,14 +1134,11 @@ class CleanupManager:
         try:
             success = True
             
-            # Remove specific files
-            if 'remove_files' in cleanup_config:
-                if not self._remove_files(cleanup_config['remove_files']):
-                    success = False
-            
-            # Remove directories
-            if 'remove_directories' in cleanup_config:
-                if not self._remove_directories(cleanup_config['remove_directories']):
+            # Remove matching files and directories in a single tree walk
+            file_patterns = cleanup_config.get('remove_files', [])
+            dir_patterns = cleanup_config.get('remove_directories', [])
+            if file_patterns or dir_patterns:
+                if not self._remove_paths(file_patterns, dir_patterns):
                     success = False
             
             # Run cleanup commands
@@ -515,74 +1154,166 @@ class CleanupManager:
     
     def _remove_files(self, file_patterns: List[str]) -> bool:
         """Remove files matching patterns"""
+        return self._remove_paths(file_patterns, [])
+    
+    def _remove_directories(self, dir_patterns: List[str]) -> bool:
+        """Remove directories matching patterns"""
+        return self._remove_paths([], dir_patterns)
+    
+    def _remove_paths(self, file_patterns: List[str], dir_patterns: List[str]) -> bool:
+        """Remove files and directories matching patterns in a single tree walk"""
         try:
             import glob
             
+            # A trailing slash only ever matches directories, as with glob.glob
+            file_regexes = [
+                self._compile_glob(p) for p in file_patterns
+                if not os.path.isabs(p) and not p.endswith('/')
+            ]
+            dir_regexes = [self._compile_glob(p) for p in dir_patterns if not os.path.isabs(p)]
+            
+            # Only descend as deep as the relative patterns can reach
+            relative = [
+                self._normalize_glob(p) for p in list(file_patterns) + list(dir_patterns)
+                if not os.path.isabs(p)
+            ]
+            if any('**' in p for p in relative):
+                max_depth = None
+            else:
+                max_depth = max((len(p.strip('/').split('/')) for p in relative), default=0)
+            
+            if relative:
+                self._remove_matching(str(self.app_dir), '', 1, max_depth, file_regexes, dir_regexes)
+            
+            # Absolute patterns point outside the app tree, resolve them directly
             for pattern in file_patterns:
-                # Use glob to find matching files
-                full_pattern = str(self.app_dir / pattern)
-                matching_files = glob.glob(full_pattern, recursive=True)
-                
-                for file_path in matching_files:
-                    try:
+                if os.path.isabs(pattern):
+                    for file_path in glob.glob(pattern, recursive=True):
                         if os.path.isfile(file_path):
                             os.remove(file_path)
                             self.logger.debug(f"Removed file: {file_path}")
-                    except Exception as e:
-                        self.logger.warning(f"Failed to remove file {file_path}: {e}")
-            
-            return True
-            
-        except Exception as e:
-            self.logger.error(f"File removal failed: {e}")
-            return False
-    
-    def _remove_directories(self, dir_patterns: List[str]) -> bool:
-        """Remove directories matching patterns"""
-        try:
-            import glob
             
             for pattern in dir_patterns:
-                full_pattern = str(self.app_dir / pattern)
-                matching_dirs = glob.glob(full_pattern, recursive=True)
-                
-                for dir_path in matching_dirs:
-                    try:
+                if os.path.isabs(pattern):
+                    for dir_path in glob.glob(pattern, recursive=True):
                         if os.path.isdir(dir_path):
                             shutil.rmtree(dir_path)
                             self.logger.debug(f"Removed directory: {dir_path}")
-                    except Exception as e:
-                        self.logger.warning(f"Failed to remove directory {dir_path}: {e}")
             
             return True
             
         except Exception as e:
-            self.logger.error(f"Directory removal failed: {e}")
+            self.logger.error(f"Path removal failed: {e}")
             return False
     
+    def _remove_matching(self, directory: str, prefix: str, depth: int, max_depth: Optional[int],
+                         file_regexes: List['re.Pattern'], dir_regexes: List['re.Pattern']):
+        """Scan directory once, removing matches and descending into the rest"""
+        with os.scandir(directory) as it:
+            entries = list(it)
+        
+        for entry in entries:
+            rel_path = prefix + entry.name
+            try:
+                # DirEntry type checks reuse the readdir data, no extra stat
+                if entry.is_dir(follow_symlinks=False):
+                    if any(r.match(rel_path) for r in dir_regexes):
+                        shutil.rmtree(entry.path)
+                        self.logger.debug("Removed directory: %s", entry.path)
+                    elif max_depth is None or depth < max_depth:
+                        self._remove_matching(entry.path, rel_path + '/', depth + 1, max_depth,
+                                              file_regexes, dir_regexes)
+                    
+                elif entry.is_file() and any(r.match(rel_path) for r in file_regexes):
+                    os.remove(entry.path)
+                    self.logger.debug("Removed file: %s", entry.path)
+                
+            except Exception as e:
+                self.logger.warning("Failed to remove %s: %s", entry.path, e)
+    
+    @staticmethod
+    def _normalize_glob(pattern: str) -> str:
+        """Drop the no-op components glob.glob ignores: '.', empty and repeated '**'"""
+        components = []
+        for component in pattern.split('/'):
+            if component in ('', '.') or (component == '**' and components[-1:] == ['**']):
+                continue
+            components.append(component)
+        return '/'.join(components)
+    
+    @staticmethod
+    def _compile_glob(pattern: str) -> 're.Pattern':
+        """Translate a glob pattern into a regex with glob.glob semantics"""
+        components = CleanupManager._normalize_glob(pattern).split('/')
+        regex = ''
+        
+        for index, component in enumerate(components):
+            last = index == len(components) - 1
+            
+            if component == '**':
+                if not last:
+                    # Zero or more non-hidden directories
+                    regex += r'(?:(?!\.)[^/]+/)*'
+                elif regex.endswith('/'):
+                    # Trailing: the directory itself and everything below it
+                    regex = regex[:-1] + r'(?:/(?!\.)[^/]+)*'
+                else:
+                    regex += r'(?:(?!\.)[^/]+(?:/(?!\.)[^/]+)*)?'
+                continue
+            
+            # Like glob.glob, wildcards never match hidden names
+            if not component.startswith('.'):
+                regex += r'(?!\.)'
+            
+            i = 0
+            while i < len(component):
+                char = component[i]
+                end = component.find(']', i + 2) if char == '[' else -1
+                if char == '*':
+                    regex += '[^/]*'
+                elif char == '?':
+                    regex += '[^/]'
+                elif end != -1:
+                    chars = component[i + 1:end].replace('\\', '\\\\').replace('[', '\\[')
+                    if chars.startswith('!'):
+                        chars = '^' + chars[1:]
+                    elif chars.startswith('^'):
+                        chars = '\\' + chars
+                    regex += f'[{chars}]'
+                    i = end
+                else:
+                    regex += re.escape(char)
+                i += 1
+            
+            if not last:
+                regex += '/'
+        
+        return re.compile(regex + r'\Z')
+    
     def _run_commands(self, commands: List[str]) -> bool:
         """Run cleanup commands"""
         try:
-            for command in commands:
-                try:
-                    result = subprocess.run(
-                        command,
-                        shell=True,
-                        cwd=self.app_dir,
-                        timeout=120,
-                        capture_output=True,
-                        text=True
-                    )
-                    
-                    if result.returncode == 0:
-                        self.logger.info(f"Cleanup command completed: {command}")
-                    else:
-                        self.logger.warning(f"Cleanup command failed: {command} - {result.stderr}")
+            with ShellSession() as shell:
+                for command in commands:
+                    try:
+                        # List entries are argv vectors and bypass the shell
+                        if isinstance(command, list):
+                            result = subprocess.run(
+                                command, cwd=self.app_dir, timeout=120,
+                                capture_output=True, text=True
+                            )
+                        else:
+                            result = shell.run(command, cwd=self.app_dir, timeout=120)
                         
-                except subprocess.TimeoutExpired:
-                    self.logger.warning(f"Cleanup command timeout: {command}")
-                except Exception as e:
-                    self.logger.warning(f"Cleanup command error: {command} - {e}")
+                        if result.returncode == 0:
+                            self.logger.info(f"Cleanup command completed: {command}")
+                        else:
+                            self.logger.warning(f"Cleanup command failed: {command} - {result.stderr}")
+                        
+                    except subprocess.TimeoutExpired:
+                        self.logger.warning(f"Cleanup command timeout: {command}")
+                    except Exception as e:
+                        self.logger.warning(f"Cleanup command error: {command} - {e}")
             
             return True
             
@@ -602,11 +1333,9 @@ class AdvancedConfigMerger:
             # Load configurations
             old_config = {}
             if old_path.exists():
-                with open(old_path, 'rb') as f:
-                    old_config = tomllib.load(f)
+                old_config = load_toml(old_path)
             
-            with open(new_path, 'rb') as f:
-                new_config = tomllib.load(f)
+            new_config = load_toml(new_path)
             
             # Apply section-specific merging
             merged_config = AdvancedConfigMerger._apply_section_strategies(
@@ -663,34 +1392,41 @@ class AdvancedConfigMerger:
     @staticmethod
     def _merge_preserve_user(old_section: Dict, new_section: Dict) -> Dict:
         """Merge preserving user values, adding new keys"""
-        merged = new_section.copy()
+        merged = {}
         
-        def recursive_merge(old_dict, new_dict, merged_dict):
-            for key, value in old_dict.items():
-                if key in new_dict:
-                    if isinstance(value, dict) and isinstance(new_dict[key], dict):
-                        if key not in merged_dict:
-                            merged_dict[key] = {}
-                        recursive_merge(value, new_dict[key], merged_dict[key])
-                    else:
-                        merged_dict[key] = value
+        # Walk nested tables with an explicit worklist instead of recursion
+        pending = [(old_section, new_section, merged)]
+        while pending:
+            old_dict, new_dict, merged_dict = pending.pop()
+            merged_dict.update(new_dict)
+            
+            for key in old_dict.keys() & new_dict.keys():
+                old_value, new_value = old_dict[key], new_dict[key]
+                if isinstance(old_value, dict) and isinstance(new_value, dict):
+                    merged_dict[key] = {}
+                    pending.append((old_value, new_value, merged_dict[key]))
+                else:
+                    merged_dict[key] = old_value
         
-        recursive_merge(old_section, new_section, merged)
         return merged
     
     @staticmethod
     def _merge_update_only(old_section: Dict, new_section: Dict) -> Dict:
         """Only add new keys, preserve existing values"""
-        merged = old_section.copy()
+        merged = {}
         
-        def recursive_update(old_dict, new_dict):
-            for key, value in new_dict.items():
-                if key not in old_dict:
-                    old_dict[key] = value
-                elif isinstance(value, dict) and isinstance(old_dict[key], dict):
-                    recursive_update(old_dict[key], value)
+        pending = [(old_section, new_section, merged)]
+        while pending:
+            old_dict, new_dict, merged_dict = pending.pop()
+            merged_dict.update(old_dict)
+            merged_dict.update({key: value for key, value in new_dict.items() if key not in old_dict})
+            
+            for key in old_dict.keys() & new_dict.keys():
+                old_value, new_value = old_dict[key], new_dict[key]
+                if isinstance(old_value, dict) and isinstance(new_value, dict):
+                    merged_dict[key] = {}
+                    pending.append((old_value, new_value, merged_dict[key]))
         
-        recursive_update(merged, new_section)
         return merged
     
     @staticmethod
@@ -713,19 +1449,49 @@ class TestRunner:
         self.logger = logging.getLogger(__name__)
     
     def run_tests(self, tests: List[Dict]) -> Tuple[bool, List[str]]:
-        """Run all tests, return (success, failed_tests)"""
-        failed_tests = []
+        """Run all tests concurrently, return (success, failed_tests)"""
+        if not tests:
+            return True, []
+        
+        import asyncio
         
-        for test in tests:
-            if not self._run_single_test(test):
-                failed_tests.append(test.get('name', 'unnamed_test'))
+        results = asyncio.run(self._run_tests_async(tests))
+        failed_tests = [
+            test.get('name', 'unnamed_test')
+            for test, passed in zip(tests, results) if not passed
+        ]
         
         return len(failed_tests) == 0, failed_tests
     
+    async def _run_tests_async(self, tests: List[Dict]) -> List[bool]:
+        """Run tests with bounded concurrency, results in manifest order"""
+        import asyncio
+        
+        limit = min(len(tests), (os.cpu_count() or 1) * 4)
+        semaphore = asyncio.Semaphore(limit)
+        
+        async def run_limited(test):
+            async with semaphore:
+                return await self._run_single_test_async(test)
+        
+        results = await asyncio.gather(
+            *(run_limited(test) for test in tests), return_exceptions=True
+        )
+        return [result is True for result in results]
+    
     def _run_single_test(self, test: Dict) -> bool:
         """Run a single test with full configuration support"""
+        import asyncio
+        
+        return asyncio.run(self._run_single_test_async(test))
+    
+    async def _run_single_test_async(self, test: Dict) -> bool:
+        """Run a single test with full configuration support"""
+        import asyncio
+        
         name = test.get('name', 'unnamed_test')
         command = test.get('command')
+        argv = test.get('argv')
         timeout = test.get('timeout', 30)
         retry_count = test.get('retry_count', 1)
         retry_delay = test.get('retry_delay', 1)
@@ -734,29 +1500,48 @@ class TestRunner:
         
         for attempt in range(retry_count):
             try:
-                result = subprocess.run(
-                    command,
-                    shell=True,
-                    timeout=timeout,
-                    capture_output=True,
-                    text=True
-                )
+                # An argv list is executed directly, without a shell
+                if isinstance(argv, list):
+                    process = await asyncio.create_subprocess_exec(
+                        *argv,
+                        stdout=asyncio.subprocess.PIPE,
+                        stderr=asyncio.subprocess.PIPE,
+                        start_new_session=True
+                    )
+                else:
+                    process = await asyncio.create_subprocess_shell(
+                        command,
+                        stdout=asyncio.subprocess.PIPE,
+                        stderr=asyncio.subprocess.PIPE,
+                        start_new_session=True
+                    )
+                
+                try:
+                    _, stderr = await asyncio.wait_for(process.communicate(), timeout)
+                except (asyncio.TimeoutError, asyncio.CancelledError):
+                    # Kill the whole group, children of the shell hold the pipes open
+                    try:
+                        os.killpg(process.pid, signal.SIGKILL)
+                    except OSError:
+                        process.kill()
+                    await process.wait()
+                    raise
                 
-                if result.returncode == 0:
+                if process.returncode == 0:
                     self.logger.info(f"Test passed: {name}")
                     return True
                 else:
-                    self.logger.warning(f"Test failed (attempt {attempt + 1}): {name} - {result.stderr}")
+                    stderr = stderr.decode(errors='replace')
+                    self.logger.warning(f"Test failed (attempt {attempt + 1}): {name} - {stderr}")
                     
-            except subprocess.TimeoutExpired:
+            except asyncio.TimeoutError:
                 self.logger.warning(f"Test timeout (attempt {attempt + 1}): {name}")
             except Exception as e:
                 self.logger.warning(f"Test error (attempt {attempt + 1}): {name} - {e}")
             
             # Wait before retry (except on last attempt)
             if attempt < retry_count - 1:
-                import time
-                time.sleep(retry_delay)
+                await asyncio.sleep(retry_delay)
         
         self.logger.error(f"Test failed after {retry_count} attempts: {name}")
         return False
@@ -767,19 +1552,52 @@ class NotificationSender:
     
     def __init__(self):
         self.logger = logging.getLogger(__name__)
+        self._session = None
+        self._session_lock = threading.Lock()
     
     def send_notifications(self, notifications: List[Dict], context: Dict):
         """Send notifications with context substitution"""
-        for notification in notifications:
-            try:
-                self._send_notification(notification, context)
-            except Exception as e:
-                self.logger.error(f"Failed to send notification: {e}")
+        from concurrent.futures import ThreadPoolExecutor
+        
+        webhooks = [n for n in notifications if n.get('type') == 'webhook']
+        if len(webhooks) < 2:
+            for notification in notifications:
+                self._send_safely(notification, context)
+            return
+        
+        # Webhooks mostly wait on the network, post them side by side over the pooled session
+        with ThreadPoolExecutor(max_workers=min(8, len(webhooks))) as executor:
+            for notification in webhooks:
+                executor.submit(self._send_safely, notification, context)
+            for notification in notifications:
+                if notification.get('type') != 'webhook':
+                    self._send_safely(notification, context)
+    
+    def _send_safely(self, notification: Dict, context: Dict):
+        """Send single notification, logging instead of raising on failure"""
+        try:
+            self._send_notification(notification, context)
+        except Exception as e:
+            self.logger.error(f"Failed to send notification: {e}")
+    
+    def _get_session(self):
+        """Shared HTTP session, keeps connections alive between webhook calls"""
+        with self._session_lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=8, pool_maxsize=32)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._session = session
+            return self._session
     
     def _send_notification(self, notification: Dict, context: Dict):
         """Send single notification"""
         notif_type = notification.get('type')
-        message = notification.get('message', '').format(**context)
+        message = render_template(notification.get('message', ''), context)
         
         if notif_type == 'log':
             level = notification.get('level', 'info')
@@ -789,7 +1607,7 @@ class NotificationSender:
             url = notification.get('url')
             if url:
                 payload = {'text': message}
-                response = requests.post(url, json=payload, timeout=10)
+                response = self._get_session().post(url, json=payload, timeout=10)
                 response.raise_for_status()
                 self.logger.info(f"Webhook notification sent: {message}")
         
@@ -801,12 +1619,25 @@ class NotificationSender:
 class StagedRolloutManager:
     """Handles staged rollouts and canary deployments"""
     
-    def __init__(self, system_id: str):
+    def __init__(self, system_id: str, state_file: Optional[Path] = None):
         self.system_id = system_id
         self.logger = logging.getLogger(__name__)
+        
+        # Stable 0-99 bucket for this system. hash() is randomized per process,
+        # which would move systems between rollout stages on every run.
+        digest = hashlib.blake2b(system_id.encode(), digest_size=8).digest()
+        self._bucket = int.from_bytes(digest, 'little') % 100
+        
+        # When this system first reached each stage, read once and written on change
+        self.state_file = Path(state_file) if state_file is not None else Path('.ship_stages.json')
+        self.stages_state = self._load_stages_state()
     
-    def should_update_in_stage(self, rollout_config: Dict) -> Tuple[bool, str]:
-        """Check if this system should update in current stage"""
+    def should_update_in_stage(self, rollout_config: Dict, version: Optional[str] = None,
+                               record: bool = True) -> Tuple[bool, str]:
+        """Check if this system should update in current stage
+        
+        With record=False the check is read-only and does not start a stage's wait time.
+        """
         if not rollout_config or rollout_config.get('strategy') != 'staged':
             return True, "No staged rollout configured"
         
@@ -820,8 +1651,9 @@ class StagedRolloutManager:
             
             # Check if system matches criteria for this stage
             if self._matches_criteria(criteria, percentage):
-                # Check if wait time has passed
-                if self._has_wait_time_passed(stage_name, wait_hours):
+                # Check if wait time has passed, every release waits anew
+                stage_key = f"{version}:{stage_name}" if version is not None else stage_name
+                if self._has_wait_time_passed(stage_key, wait_hours, record):
                     return True, f"Updating in stage: {stage_name}"
                 else:
                     return False, f"Waiting for stage {stage_name} (wait time not elapsed)"
@@ -832,17 +1664,13 @@ class StagedRolloutManager:
         """Check if system matches stage criteria"""
         if not criteria:
             # Use percentage-based selection with system_id hash
-            system_hash = hash(self.system_id) % 100
-            return system_hash < percentage
+            return self._bucket < percentage
         
         try:
-            # Evaluate criteria expression
-            # This is a simplified version - could be enhanced with proper expression parser
+            # Evaluate criteria expression against this system's bucket
             if 'server_id' in criteria:
-                # Replace server_id with actual system_id hash for evaluation
-                server_id = hash(self.system_id) % 100
-                expression = criteria.replace('server_id', str(server_id))
-                return eval(expression)  # Note: eval should be restricted in production
+                code = compile_criteria(criteria)
+                return bool(eval(code, {'__builtins__': {}}, {'server_id': self._bucket}))
             
             return False
             
@@ -850,72 +1678,219 @@ class StagedRolloutManager:
             self.logger.error(f"Failed to evaluate criteria: {criteria} - {e}")
             return False
     
-    def _has_wait_time_passed(self, stage_name: str, wait_hours: int) -> bool:
+    def _has_wait_time_passed(self, stage_name: str, wait_hours: int, record: bool = True) -> bool:
         """Check if wait time for stage has passed"""
         if wait_hours == 0:
             return True
         
-        # This would need to track when each stage started
-        # For now, simplified implementation
-        return True
+        now = time.time()
+        started = self.stages_state.get(stage_name)
+        if started is None:
+            if not record:
+                # The wait starts with the first update run that reaches the stage
+                return False
+            
+            # First time this system reaches the stage, the wait starts now
+            self.stages_state[stage_name] = started = now
+            if not self._save_stages_state():
+                # Without a persisted start every run would wait anew, forever
+                self.logger.error(
+                    f"Cannot record start of stage {stage_name} in {self.state_file}, "
+                    f"not enforcing its wait time"
+                )
+                return True
+        
+        return now - started >= wait_hours * 3600
+    
+    def _load_stages_state(self) -> Dict[str, float]:
+        """Load stage start timestamps, a missing or unreadable file starts empty"""
+        try:
+            with open(self.state_file, 'rb') as f:
+                state = json_loads(f.read())
+            return state if isinstance(state, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            self.logger.warning(f"Ignoring unreadable stage state {self.state_file}: {e}")
+            return {}
+    
+    def _save_stages_state(self) -> bool:
+        """Write stage start timestamps atomically, False if they could not be saved"""
+        tmp_path = None
+        try:
+            self.state_file.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.state_file.parent, prefix='.ship_stages.')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(json_dumps(self.stages_state))
+            os.replace(tmp_path, self.state_file)
+            return True
+        except OSError as e:
+            self.logger.warning(f"Failed to save stage state {self.state_file}: {e}")
+            if tmp_path is not None:
+                with contextlib.suppress(OSError):
+                    os.unlink(tmp_path)
+            return False
 
 
 class CompleteUpdateManifest:
     """Complete manifest with all features implemented"""
     
+    # Literal text of a glob up to its first wildcard or character class
+    _GLOB_PREFIX = re.compile(r'[^*?\[]*')
+    
     def __init__(self, manifest_data: Dict):
+        # Sections are looked up on first access, most commands only read a few
         self.data = manifest_data
-        self.version = manifest_data.get('version', '0.0.0')
-        self.files = manifest_data.get('files', {})
-        self.directories = manifest_data.get('directories', {})
-        self.hooks = manifest_data.get('hooks', {})
-        self.requirements = manifest_data.get('requirements', {})
-        self.security = manifest_data.get('security', {})
-        self.rollback_config = manifest_data.get('rollback', {})
-        self.notifications = manifest_data.get('notifications', {})
-        self.post_update_tests = manifest_data.get('post_update_tests', [])
-        self.conditionals = manifest_data.get('conditionals', [])
-        self.migrations = manifest_data.get('migrations', {})
-        self.cleanup = manifest_data.get('cleanup', {})
-        self.merge_strategies = manifest_data.get('merge_strategies', {})
-        self.rollout = manifest_data.get('rollout', {})
+    
+    @functools.cached_property
+    def version(self) -> str:
+        """Version this manifest updates to"""
+        return self.data.get('version', '0.0.0')
+    
+    @functools.cached_property
+    def files(self) -> Dict:
+        """Per-file actions and merge strategies"""
+        return self.data.get('files', {})
+    
+    @functools.cached_property
+    def directories(self) -> Dict:
+        """Per-directory settings"""
+        return self.data.get('directories', {})
+    
+    @functools.cached_property
+    def hooks(self) -> Dict:
+        """Pre- and post-update hook commands"""
+        return self.data.get('hooks', {})
+    
+    @functools.cached_property
+    def requirements(self) -> Dict:
+        """System requirements checked before updating"""
+        return self.data.get('requirements', {})
+    
+    @functools.cached_property
+    def security(self) -> Dict:
+        """Checksum and file validation settings"""
+        return self.data.get('security', {})
+    
+    @functools.cached_property
+    def rollback_config(self) -> Dict:
+        """Rollback behaviour on failure"""
+        return self.data.get('rollback', {})
+    
+    @functools.cached_property
+    def notifications(self) -> Dict:
+        """Success and failure notification targets"""
+        return self.data.get('notifications', {})
+    
+    @functools.cached_property
+    def post_update_tests(self) -> List:
+        """Tests run after the update is applied"""
+        return self.data.get('post_update_tests', [])
+    
+    @functools.cached_property
+    def conditionals(self) -> List:
+        """Conditional actions evaluated during the update"""
+        return self.data.get('conditionals', [])
+    
+    @functools.cached_property
+    def migrations(self) -> Dict:
+        """Migration scripts by version"""
+        return self.data.get('migrations', {})
+    
+    @functools.cached_property
+    def cleanup(self) -> Dict:
+        """Files, directories and commands to clean up"""
+        return self.data.get('cleanup', {})
+    
+    @functools.cached_property
+    def merge_strategies(self) -> Dict:
+        """Section specific config merge strategies"""
+        return self.data.get('merge_strategies', {})
+    
+    @functools.cached_property
+    def rollout(self) -> Dict:
+        """Staged rollout configuration"""
+        return self.data.get('rollout', {})
+    
+    # Patterns are compiled on the first lookup that needs them
+    @functools.cached_property
+    def _file_patterns(self) -> Tuple[List[int], Dict[str, List[Tuple[int, 're.Pattern', Dict]]]]:
+        """Compiled wildcard entries of the files section, bucketed by their literal prefix
         
+        A path can only match a pattern that starts with the text before its first
+        wildcard, so lookups probe one bucket per distinct prefix length instead of
+        trying every pattern.
+        """
+        buckets = {}
+        for position, (pattern, config) in enumerate(self.files.items()):
+            if '*' in pattern:
+                prefix = self._GLOB_PREFIX.match(pattern).group()
+                buckets.setdefault(prefix, []).append((position, self._compile_pattern(pattern), config))
+        return sorted({len(prefix) for prefix in buckets}), buckets
+    
+    @functools.cached_property
+    def _directory_patterns(self) -> List[Tuple['re.Pattern', Dict]]:
+        """Compiled entries of the directories section"""
+        return [
+            (self._compile_pattern(pattern), config)
+            for pattern, config in self.directories.items()
+        ]
+    
+    @functools.cached_property
+    def _merge_strategy_patterns(self) -> List[Tuple['re.Pattern', Dict]]:
+        """Compiled entries of the merge_strategies section"""
+        return [
+            (self._compile_pattern(pattern), config)
+            for pattern, config in self.merge_strategies.items()
+        ]
+    
     @classmethod
     def load_from_file(cls, manifest_path: Path) -> 'CompleteUpdateManifest':
         """Load manifest from YAML file"""
         try:
-            with open(manifest_path, 'r') as f:
-                data = yaml.safe_load(f)
-            return cls(data)
+            # Key on mtime and size so an edited manifest is parsed again
+            stat_result = os.stat(manifest_path)
+            data = cls._load_data(os.path.abspath(manifest_path),
+                                  stat_result.st_mtime_ns, stat_result.st_size)
+            # An empty document loads as None
+            return cls(data or {})
         except Exception as e:
             raise UpdaterError(f"Failed to load manifest: {e}")
     
+    @staticmethod
+    @functools.lru_cache(maxsize=32)
+    def _load_data(path: str, mtime_ns: int, size: int) -> Any:
+        """Parse a manifest file once per version of it, the result is shared and never modified"""
+        return load_yaml(Path(path))
+    
     def get_file_action(self, file_path: str) -> str:
         """Get action for specific file"""
-        if file_path in self.files:
-            return self.files[file_path].get('action', 'replace')
-        
-        for pattern, config in self.files.items():
-            if self._match_pattern(file_path, pattern):
-                return config.get('action', 'replace')
-        
-        return 'replace'
+        return self.get_file_config(file_path).get('action', 'replace')
     
     def get_file_config(self, file_path: str) -> Dict:
         """Get full configuration for specific file"""
         if file_path in self.files:
             return self.files[file_path]
         
-        for pattern, config in self.files.items():
-            if self._match_pattern(file_path, pattern):
+        lengths, buckets = self._file_patterns
+        candidates = []
+        for length in lengths:
+            if length > len(file_path):
+                break
+            candidates.extend(buckets.get(file_path[:length], ()))
+        
+        # First matching pattern in manifest order wins
+        candidates.sort(key=operator.itemgetter(0))
+        for _, regex, config in candidates:
+            if regex.match(file_path):
                 return config
         
         return {'action': 'replace'}
     
     def should_preserve_directory(self, dir_path: str) -> bool:
         """Check if directory should be preserved"""
-        for pattern, config in self.directories.items():
-            if self._match_pattern(dir_path, pattern):
+        for regex, config in self._directory_patterns:
+            if regex.match(dir_path):
                 return config.get('preserve', False)
         return False
     
@@ -926,18 +1901,22 @@ class CompleteUpdateManifest:
     
     def get_merge_strategy_for_file(self, file_path: str) -> Dict:
         """Get merge strategy configuration for specific file"""
-        for file_pattern, strategy_config in self.merge_strategies.items():
-            if self._match_pattern(file_path, file_pattern):
+        for regex, strategy_config in self._merge_strategy_patterns:
+            if regex.match(file_path):
                 return strategy_config
         return {}
     
     def _match_pattern(self, path: str, pattern: str) -> bool:
         """Enhanced pattern matching with glob support"""
+        return self._compile_pattern(pattern).match(path) is not None
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _compile_pattern(pattern: str) -> 're.Pattern':
+        """Compile a manifest pattern, globbing only applies when it contains '*'"""
         if '*' not in pattern:
-            return path == pattern
-        
-        import fnmatch
-        return fnmatch.fnmatch(path, pattern)
+            return re.compile(re.escape(pattern) + r'\Z')
+        return re.compile(fnmatch.translate(pattern))
 
 
 class CompleteApplicationUpdater:
@@ -956,10 +1935,12 @@ class CompleteApplicationUpdater:
         self.security_validator = SecurityValidator()
         self.test_runner = TestRunner()
         self.notification_sender = NotificationSender()
-        self.staged_rollout = StagedRolloutManager(self.system_id)
         
         # State tracking
         self.state_file = Path(self.config['general'].get('state_file', '.ship_state.json'))
+        self.staged_rollout = StagedRolloutManager(
+            self.system_id, self.state_file.with_name('.ship_stages.json')
+        )
         
     def _load_config(self) -> Dict:
         """Load configuration from TOML file"""
@@ -999,6 +1980,15 @@ class CompleteApplicationUpdater:
     
     def apply_updates_complete(self, source_dir: Path) -> Tuple[bool, str]:
         """Complete update application with all features"""
+        from concurrent.futures import ThreadPoolExecutor
+        
+        # Installed version may have changed since the previous run
+        get_current_version.cache_clear()
+        
+        # One timestamp identifies the run in success and failure notifications
+        run_timestamp = datetime.now().isoformat()
+        manifest = None
+        
         try:
             # 1. Load manifest
             manifest_file = source_dir / 'update-manifest.yaml'
@@ -1012,44 +2002,38 @@ class CompleteApplicationUpdater:
             
             # 2. Check staged rollout
             if manifest.rollout:
-                should_update, rollout_msg = self.staged_rollout.should_update_in_stage(manifest.rollout)
+                should_update, rollout_msg = self.staged_rollout.should_update_in_stage(
+                    manifest.rollout, manifest.version
+                )
                 if not should_update:
                     self.logger.info(rollout_msg)
                     return True, f"Skipped due to staged rollout: {rollout_msg}"
                 self.logger.info(rollout_msg)
             
-            # 3. Evaluate conditionals
-            if manifest.conditionals:
-                app_dir = Path(self.config['sources']['main_repo']['app_dir'])
-                conditional_processor = ConditionalProcessor(app_dir)
-                should_continue, action_msg, manual_steps = conditional_processor.evaluate_conditionals(manifest.conditionals)
+            # 3. Evaluate conditionals, cheap and may hold the update before any other check
+            app_dir = Path(self.config['sources']['main_repo']['app_dir'])
+            error_msg = self._check_conditionals(manifest, app_dir)
+            if error_msg is not None:
+                return False, error_msg
+            
+            # 4-5. Requirements and security validation only read the system and the
+            # update, run them side by side and report in step order
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                requirements_check = executor.submit(self._check_requirements, manifest, app_dir)
+                security_check = executor.submit(self._check_security, source_dir, manifest)
                 
-                if not should_continue:
-                    if manual_steps:
-                        self.logger.error(f"Manual intervention required: {action_msg}")
-                        for step in manual_steps:
-                            self.logger.error(f"  - {step}")
-                    return False, action_msg
-            
-            # 4. Check requirements
-            if manifest.requirements:
-                req_ok, req_errors = self.requirements_checker.check_requirements(manifest.requirements)
-                if not req_ok:
-                    error_msg = f"Requirements not met: {'; '.join(req_errors)}"
-                    self.logger.error(error_msg)
+                error_msg = requirements_check.result()
+                if error_msg is not None:
                     return False, error_msg
-            
-            # 5. Security validation
-            if manifest.security:
-                if not self.security_validator.verify_checksums(source_dir, manifest.security):
-                    return False, "Checksum verification failed"
                 
-                if not self._validate_all_files_security(source_dir, manifest.security):
-                    return False, "Security validation failed"
+                error_msg, source_files = security_check.result()
+                if error_msg is not None:
+                    return False, error_msg
             
             # 6. Run pre-update hooks
             if 'pre_update' in manifest.hooks:
-                if not self._run_hooks(manifest.hooks['pre_update'], "pre-update"):
+                if not self._run_hooks(manifest.hooks['pre_update'], "pre-update",
+                                       manifest.hooks.get('parallel', False)):
                     return False, "Pre-update hooks failed"
             
             # 7. Create backup
@@ -1066,14 +2050,15 @@ class CompleteApplicationUpdater:
                     return False, "Migration scripts failed"
             
             # 9. Apply file changes with advanced merging
-            if not self._process_files_advanced(source_dir, manifest):
+            if not self._process_files_advanced(source_dir, manifest, source_files):
                 self.logger.error("File processing failed, rolling back")
                 backup_manager.restore_backup(backup_path)
                 return False, "File processing failed"
             
             # 10. Run post-update hooks
             if 'post_update' in manifest.hooks:
-                if not self._run_hooks(manifest.hooks['post_update'], "post-update"):
+                if not self._run_hooks(manifest.hooks['post_update'], "post-update",
+                                       manifest.hooks.get('parallel', False)):
                     if manifest.should_auto_rollback('service_start_fail'):
                         self.logger.error("Post-update hooks failed, auto-rolling back")
                         backup_manager.restore_backup(backup_path)
@@ -1098,7 +2083,7 @@ class CompleteApplicationUpdater:
             if 'on_success' in manifest.notifications:
                 context = {
                     'version': manifest.version, 
-                    'timestamp': datetime.now().isoformat(),
+                    'timestamp': run_timestamp,
                     'system_id': self.system_id
                 }
                 self.notification_sender.send_notifications(
@@ -1116,7 +2101,7 @@ class CompleteApplicationUpdater:
             if hasattr(manifest, 'notifications') and 'on_failure' in manifest.notifications:
                 context = {
                     'error': str(e), 
-                    'timestamp': datetime.now().isoformat(),
+                    'timestamp': run_timestamp,
                     'system_id': self.system_id
                 }
                 self.notification_sender.send_notifications(
@@ -1125,31 +2110,98 @@ class CompleteApplicationUpdater:
             
             return False, error_msg
     
-    def _validate_all_files_security(self, source_dir: Path, security_config: Dict) -> bool:
+    def _check_conditionals(self, manifest: CompleteUpdateManifest, app_dir: Path) -> Optional[str]:
+        """Step 3: evaluate conditionals, returns the error message if the update must stop"""
+        if not manifest.conditionals:
+            return None
+        
+        conditional_processor = ConditionalProcessor(app_dir)
+        should_continue, action_msg, manual_steps = conditional_processor.evaluate_conditionals(manifest.conditionals)
+        
+        if not should_continue:
+            if manual_steps:
+                self.logger.error(f"Manual intervention required: {action_msg}")
+                for step in manual_steps:
+                    self.logger.error(f"  - {step}")
+            return action_msg
+        return None
+    
+    def _check_requirements(self, manifest: CompleteUpdateManifest, app_dir: Path) -> Optional[str]:
+        """Step 4: check requirements, returns the error message if they are not met"""
+        if not manifest.requirements:
+            return None
+        
+        req_ok, req_errors = self.requirements_checker.check_requirements(
+            manifest.requirements, app_dir
+        )
+        if not req_ok:
+            error_msg = f"Requirements not met: {'; '.join(req_errors)}"
+            self.logger.error(error_msg)
+            return error_msg
+        return None
+    
+    def _check_security(self, source_dir: Path,
+                        manifest: CompleteUpdateManifest) -> Tuple[Optional[str], Optional[List[Tuple[Path, str]]]]:
+        """Step 5: security validation, returns (error message, source file listing)"""
+        if not manifest.security:
+            return None, None
+        
+        if not self.security_validator.verify_checksums(source_dir, manifest.security):
+            return "Checksum verification failed", None
+        
+        # Walk the source tree once, file processing reuses the listing
+        source_files = list(self._iter_source_files(source_dir))
+        if not self._validate_all_files_security(source_dir, manifest.security, source_files):
+            return "Security validation failed", None
+        return None, source_files
+    
+    def _validate_all_files_security(self, source_dir: Path, security_config: Dict,
+                                     source_files: Optional[List[Tuple[Path, str]]] = None) -> bool:
         """Validate all files against security policies"""
         try:
-            for file_path in source_dir.rglob('*'):
-                if file_path.is_file():
-                    valid, reason = self.security_validator.validate_file(file_path, security_config)
-                    if not valid:
-                        self.logger.error(f"Security validation failed: {reason}")
-                        return False
+            if source_files is None:
+                source_files = self._iter_source_files(source_dir)
+            
+            for file_path, _ in source_files:
+                valid, reason = self.security_validator.validate_file(file_path, security_config)
+                if not valid:
+                    self.logger.error("Security validation failed: %s", reason)
+                    return False
             return True
         except Exception as e:
             self.logger.error(f"Security validation error: {e}")
             return False
     
-    def _process_files_advanced(self, source_dir: Path, manifest: CompleteUpdateManifest) -> bool:
+    def _process_files_advanced(self, source_dir: Path, manifest: CompleteUpdateManifest,
+                                source_files: Optional[List[Tuple[Path, str]]] = None) -> bool:
         """Process files with advanced merge strategies"""
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+        
         try:
             app_dir = Path(self.config['sources']['main_repo']['app_dir'])
             
-            for source_file in self._get_all_files(source_dir):
-                rel_path = source_file.relative_to(source_dir)
-                target_file = app_dir / rel_path
-                
-                if not self._process_single_file_advanced(source_file, target_file, str(rel_path), manifest):
-                    return False
+            if source_files is None:
+                source_files = self._iter_source_files(source_dir)
+            
+            jobs = [(source_file, app_dir / rel_path, rel_path) for source_file, rel_path in source_files]
+            if not jobs:
+                return True
+            
+            # Every job writes a distinct target, file I/O releases the GIL
+            workers = min(32, (os.cpu_count() or 1) * 4, len(jobs))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(self._process_single_file_advanced, source_file, target_file, rel_path, manifest)
+                    for source_file, target_file, rel_path in jobs
+                ]
+                try:
+                    for future in as_completed(futures):
+                        if not future.result():
+                            return False
+                finally:
+                    # Abort on first failure: drop files that have not started yet
+                    for future in futures:
+                        future.cancel()
             
             return True
             
@@ -1160,26 +2212,27 @@ class CompleteApplicationUpdater:
     def _process_single_file_advanced(self, source_file: Path, target_file: Path, 
                                     rel_path: str, manifest: CompleteUpdateManifest) -> bool:
         """Process single file with advanced strategies"""
-        action = manifest.get_file_action(rel_path)
         config = manifest.get_file_config(rel_path)
+        action = config.get('action', 'replace')
         
-        self.logger.debug(f"Processing {rel_path} with action: {action}")
+        # Lazy %-formatting, nothing is built per file unless the level is enabled
+        self.logger.debug("Processing %s with action: %s", rel_path, action)
         
         try:
             # Ensure target directory exists
             target_file.parent.mkdir(parents=True, exist_ok=True)
             
             if action == 'skip':
-                self.logger.info(f"Skipping {rel_path}")
+                self.logger.info("Skipping %s", rel_path)
                 return True
                 
             elif action == 'replace':
-                shutil.copy2(source_file, target_file)
-                self.logger.info(f"Replaced {rel_path}")
+                fast_copy(source_file, target_file)
+                self.logger.info("Replaced %s", rel_path)
                 return True
                 
             elif action == 'merge_toml':
-                return self._merge_toml_advanced(source_file, target_file, rel_path, manifest)
+                return self._merge_toml_advanced(source_file, target_file, rel_path, manifest, config)
                 
             elif action == 'merge_json':
                 return self._merge_json_file(source_file, target_file, config)
@@ -1187,21 +2240,22 @@ class CompleteApplicationUpdater:
             elif action == 'backup_replace':
                 if target_file.exists():
                     backup_file = target_file.with_suffix(target_file.suffix + '.backup')
-                    shutil.copy2(target_file, backup_file)
-                shutil.copy2(source_file, target_file)
-                self.logger.info(f"Backup-replaced {rel_path}")
+                    fast_copy(target_file, backup_file)
+                fast_copy(source_file, target_file)
+                self.logger.info("Backup-replaced %s", rel_path)
                 return True
                 
             else:
-                self.logger.warning(f"Unknown action '{action}' for {rel_path}")
+                self.logger.warning("Unknown action '%s' for %s", action, rel_path)
                 return False
                 
         except Exception as e:
-            self.logger.error(f"Failed to process {rel_path}: {e}")
+            self.logger.error("Failed to process %s: %s", rel_path, e)
             return False
     
     def _merge_toml_advanced(self, source_file: Path, target_file: Path, 
-                           rel_path: str, manifest: CompleteUpdateManifest) -> bool:
+                           rel_path: str, manifest: CompleteUpdateManifest,
+                           file_config: Optional[Dict] = None) -> bool:
         """Merge TOML with advanced section-specific strategies"""
         try:
             merge_config = manifest.get_merge_strategy_for_file(rel_path)
@@ -1213,7 +2267,9 @@ class CompleteApplicationUpdater:
                 )
             else:
                 # Use basic merge strategy
-                strategy = manifest.get_file_config(rel_path).get('merge_strategy', 'preserve_user')
+                if file_config is None:
+                    file_config = manifest.get_file_config(rel_path)
+                strategy = file_config.get('merge_strategy', 'preserve_user')
                 return self._merge_toml_basic(source_file, target_file, strategy)
                 
         except Exception as e:
@@ -1226,11 +2282,9 @@ class CompleteApplicationUpdater:
             # Load files
             old_config = {}
             if target_file.exists():
-                with open(target_file, 'rb') as f:
-                    old_config = tomllib.load(f)
+                old_config = load_toml(target_file)
             
-            with open(source_file, 'rb') as f:
-                new_config = tomllib.load(f)
+            new_config = load_toml(source_file)
             
             # Apply strategy
             if strategy == 'preserve_user':
@@ -1255,11 +2309,9 @@ class CompleteApplicationUpdater:
         try:
             old_data = {}
             if target_file.exists():
-                with open(target_file) as f:
-                    old_data = json.load(f)
+                old_data = load_json(target_file)
             
-            with open(source_file) as f:
-                new_data = json.load(f)
+            new_data = load_json(source_file)
             
             strategy = config.get('merge_strategy', 'preserve_user')
             if strategy == 'preserve_user':
@@ -1267,25 +2319,28 @@ class CompleteApplicationUpdater:
             else:
                 merged = new_data
             
-            with open(target_file, 'w') as f:
-                json.dump(merged, f, indent=2)
+            with open(target_file, 'wb') as f:
+                f.write(json_dumps(merged))
             
-            self.logger.info(f"Merged JSON file {target_file}")
+            self.logger.info("Merged JSON file %s", target_file)
             return True
             
         except Exception as e:
             self.logger.error(f"JSON merge failed for {target_file}: {e}")
             return False
     
-    def _run_hooks(self, hooks: List[str], hook_type: str) -> bool:
+    def _run_hooks(self, hooks: List[str], hook_type: str, parallel: bool = False) -> bool:
         """Run hooks with comprehensive error handling"""
+        if parallel and len(hooks) > 1:
+            import asyncio
+            
+            # Hooks declared independent run side by side, every one runs to completion
+            return all(asyncio.run(self._run_hooks_async(hooks, hook_type)))
+        
         for hook in hooks:
             try:
                 self.logger.info(f"Running {hook_type} hook: {hook}")
-                result = subprocess.run(
-                    hook, shell=True, check=True, 
-                    capture_output=True, text=True, timeout=600
-                )
+                self._run_hook_command(hook)
                 self.logger.info(f"Hook completed: {hook}")
             except subprocess.CalledProcessError as e:
                 self.logger.error(f"Hook failed: {hook} - {e.stderr}")
@@ -1298,6 +2353,78 @@ class CompleteApplicationUpdater:
                 return False
         return True
     
+    def _run_hook_command(self, hook: str) -> subprocess.CompletedProcess:
+        """Run a hook, executing it directly when it needs no shell features"""
+        argv = split_command(hook)
+        if argv is not None:
+            try:
+                return subprocess.run(argv, check=True, capture_output=True, text=True, timeout=600)
+            except FileNotFoundError:
+                # Not a program on PATH, let the shell resolve builtins or report it
+                pass
+            except OSError as e:
+                # A script without #! line, /bin/sh runs it as a shell script
+                if e.errno != errno.ENOEXEC:
+                    raise
+        return subprocess.run(hook, shell=True, check=True, capture_output=True, text=True, timeout=600)
+    
+    async def _run_hooks_async(self, hooks: List[str], hook_type: str) -> List[bool]:
+        """Run all hooks concurrently, results in manifest order"""
+        import asyncio
+        
+        return await asyncio.gather(*(self._run_hook_async(hook, hook_type) for hook in hooks))
+    
+    async def _run_hook_async(self, hook: str, hook_type: str) -> bool:
+        """Run a single hook on the event loop"""
+        import asyncio
+        
+        try:
+            self.logger.info(f"Running {hook_type} hook: {hook}")
+            process = None
+            argv = split_command(hook)
+            if argv is not None:
+                try:
+                    process = await asyncio.create_subprocess_exec(
+                        *argv,
+                        stdout=asyncio.subprocess.PIPE,
+                        stderr=asyncio.subprocess.PIPE,
+                        start_new_session=True
+                    )
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    if e.errno != errno.ENOEXEC:
+                        raise
+            if process is None:
+                process = await asyncio.create_subprocess_shell(
+                    hook,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    start_new_session=True
+                )
+            
+            try:
+                _, stderr = await asyncio.wait_for(process.communicate(), 600)
+            except asyncio.TimeoutError:
+                # Kill the whole group, children of the shell hold the pipes open
+                try:
+                    os.killpg(process.pid, signal.SIGKILL)
+                except OSError:
+                    process.kill()
+                await process.wait()
+                self.logger.error(f"Hook timeout: {hook}")
+                return False
+            
+            if process.returncode != 0:
+                self.logger.error(f"Hook failed: {hook} - {stderr.decode(errors='replace')}")
+                return False
+            
+            self.logger.info(f"Hook completed: {hook}")
+            return True
+        except Exception as e:
+            self.logger.error(f"Hook error: {hook} - {e}")
+            return False
+    
     def _get_backup_manager(self):
         """Get backup manager instance"""
         # This would import from the main updater module
@@ -1313,30 +2440,32 @@ class CompleteApplicationUpdater:
             
             def create_backup(self, tag):
                 backup_path = self.backup_dir / f"backup_{tag}"
-                subprocess.run([
-                    'rsync', '-a', '--delete',
-                    str(self.app_dir) + '/',
-                    str(backup_path) + '/'
-                ], check=True)
+                mirror_tree(self.app_dir, backup_path)
                 return backup_path
             
             def restore_backup(self, backup_path):
-                subprocess.run([
-                    'rsync', '-a', '--delete',
-                    str(backup_path) + '/',
-                    str(self.app_dir) + '/'
-                ], check=True)
+                mirror_tree(backup_path, self.app_dir)
                 return True
         
         return SimpleBackupManager(app_dir, backup_dir)
     
     def _get_all_files(self, directory: Path) -> List[Path]:
         """Get all files in directory recursively"""
-        files = []
-        for item in directory.rglob('*'):
-            if item.is_file():
-                files.append(item)
-        return files
+        return [source_file for source_file, _ in self._iter_source_files(directory)]
+    
+    def _iter_source_files(self, directory: Path):
+        """Yield (file path, path relative to directory) for all files recursively"""
+        pending = [(str(directory), '')]
+        while pending:
+            path, prefix = pending.pop()
+            # DirEntry reuses the type from readdir, no stat per entry
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    rel_path = prefix + entry.name
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append((entry.path, rel_path + '/'))
+                    elif entry.is_file():
+                        yield Path(entry.path), rel_path
 
 
 def main():
@@ -1363,8 +2492,17 @@ def main():
             
         if args.check_requirements:
             manifest = CompleteUpdateManifest.load_from_file(Path(args.check_requirements))
+            
+            # Check free space where the updater installs, not on /
+            app_dir = None
+            if Path(args.config).exists():
+                with open(args.config, 'rb') as f:
+                    main_repo = tomllib.load(f).get('sources', {}).get('main_repo', {})
+                if main_repo.get('app_dir'):
+                    app_dir = Path(main_repo['app_dir'])
+            
             checker = RequirementsChecker()
-            req_ok, errors = checker.check_requirements(manifest.requirements)
+            req_ok, errors = checker.check_requirements(manifest.requirements, app_dir)
             if req_ok:
                 print("✅ All requirements met")
                 return 0
@@ -1391,8 +2529,18 @@ def main():
             manifest = CompleteUpdateManifest.load_from_file(Path(args.check_rollout))
             import socket
             system_id = socket.gethostname()
-            rollout_manager = StagedRolloutManager(system_id)
-            should_update, msg = rollout_manager.should_update_in_stage(manifest.rollout)
+            
+            # Read the stage state the updater keeps, without starting any wait
+            state_file = Path('.ship_state.json')
+            if Path(args.config).exists():
+                with open(args.config, 'rb') as f:
+                    general = tomllib.load(f).get('general', {})
+                state_file = Path(general.get('state_file', state_file))
+            
+            rollout_manager = StagedRolloutManager(system_id, state_file.with_name('.ship_stages.json'))
+            should_update, msg = rollout_manager.should_update_in_stage(
+                manifest.rollout, manifest.version, record=False
+            )
             print(f"Rollout eligibility: {should_update}")
             print(f"Message: {msg}")
             return 0